@@ -0,0 +1,558 @@
+# Copyright (C) 2026  the Conpot developers
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
+
+import fcntl
+import logging
+import os
+import select
+import socket
+import sys
+import threading
+
+import serial
+from gevent import monkey
+from lxml import etree
+
+logger = logging.getLogger(__name__)
+
+# conpot monkey-patches the stdlib at startup and gevent's aggressive
+# select patch deletes select.epoll; this reactor runs in a real OS
+# thread and needs the original primitive either way
+_epoll = monkey.get_original("select", "epoll")
+
+# base event mask for client sockets; EPOLLOUT is added only while a
+# client has pending outbound data
+CLIENT_EVENTS = select.EPOLLIN | select.EPOLLET | select.EPOLLRDHUP
+
+# default bytes read per recv/read syscall; page-sized so bulk traffic
+# amortizes the syscall cost instead of paying it every 80 bytes
+RECV_CHUNK = 4096
+
+# socket buffer size for accepted clients; generous so bursts are
+# absorbed by the kernel instead of causing extra wakeups
+SOCK_BUF_SIZE = 1 << 20
+
+# writev rejects more iovecs than this with EINVAL
+try:
+    IOV_MAX = os.sysconf("SC_IOV_MAX")
+except (OSError, ValueError):  # pragma: no cover
+    IOV_MAX = 1024
+if IOV_MAX <= 0:  # pragma: no cover
+    IOV_MAX = 1024
+
+# caps on per-client memory: the debug capture ring keeps only the most
+# recent traffic, and data for a client whose outbox is full is dropped
+DEBUG_CAPTURE = 1 << 16
+OUTBOX_LIMIT = 1 << 16
+
+# ring capacity schedule, checked against cumulative bytes written:
+# short sessions stay at the 4KB initial allocation, long-lived ones
+# graduate in a few steps instead of reallocating constantly
+RING_INITIAL = 1 << 12
+_RING_GROWTH = (
+    (1 << 20, 1 << 16),
+    (1 << 18, 1 << 15),
+    (1 << 16, 1 << 14),
+)
+
+# template expressions compiled once instead of re-parsed per server
+_XP_NAME = etree.XPath("@name")
+_XP_HOST = etree.XPath("@host")
+_XP_PORT = etree.XPath("@port")
+_XP_DEVICE = etree.XPath("./device/text()")
+_XP_BAUDRATE = etree.XPath("./baudrate/text()")
+_XP_DATABITS = etree.XPath("./databits/text()")
+_XP_PARITY = etree.XPath("./parity/text()")
+_XP_STOPBITS = etree.XPath("./stopbits/text()")
+_XP_RECEIVE_CHUNK = etree.XPath("./receive_chunk/text()")
+
+
+class RingBuf(object):
+    """Bounded byte ring that keeps the most recent writes.
+
+    Older data is overwritten once the capacity is reached, so memory
+    stays bounded no matter how long a connection lives. The ring starts
+    small and grows along _RING_GROWTH as cumulative traffic crosses the
+    thresholds, up to the hard capacity it was constructed with.
+    """
+
+    __slots__ = ("buf", "cap", "maxcap", "head", "size", "total")
+
+    def __init__(self, cap):
+        self.maxcap = cap
+        self.cap = min(RING_INITIAL, cap)
+        self.buf = bytearray(self.cap)
+        # next write offset, number of valid bytes, lifetime bytes seen
+        self.head = 0
+        self.size = 0
+        self.total = 0
+
+    def __len__(self):
+        return self.size
+
+    def _grow(self, cap):
+        data = self.getvalue()
+        self.buf = bytearray(cap)
+        self.cap = cap
+        self.buf[: len(data)] = data
+        self.head = len(data)
+        self.size = len(data)
+
+    def write(self, data):
+        self.total += len(data)
+        if self.cap < self.maxcap:
+            for threshold, cap in _RING_GROWTH:
+                if self.total >= threshold:
+                    if cap > self.cap:
+                        self._grow(min(cap, self.maxcap))
+                    break
+        cap = self.cap
+        n = len(data)
+        if n >= cap:
+            self.buf[:] = data[len(data) - cap :]
+            self.head = 0
+            self.size = cap
+            return
+        head = self.head
+        first = min(n, cap - head)
+        self.buf[head : head + first] = data[:first]
+        if first < n:
+            self.buf[: n - first] = data[first:]
+        self.head = (head + n) % cap
+        self.size = min(self.size + n, cap)
+
+    def getvalue(self):
+        if self.size < self.cap:
+            return bytes(self.buf[: self.size])
+        return bytes(self.buf[self.head :]) + bytes(self.buf[: self.head])
+
+
+class ClientState(object):
+    """Per-connection record for one accepted client socket.
+
+    Everything the event loop needs for a client lives here as a slot,
+    so handling an I/O event costs one fd lookup plus attribute reads
+    instead of a dict lookup per piece of state. The buffers exist from
+    connect time onwards, so the append paths never test for first
+    contact: each chunk is one unconditional append.
+    """
+
+    __slots__ = (
+        "sock",
+        "fd",
+        "address",
+        "rbuf",
+        "sbuf",
+        "events",
+        "index",
+        "rx_count",
+        "tx_count",
+    )
+
+    def __init__(self, sock, address, capture=False):
+        self.sock = sock
+        # resolved once here so no event handler pays for fileno() again
+        self.fd = sock.fileno()
+        self.address = address
+        # position in SerialServer._client_list, kept for swap-pop removal
+        self.index = -1
+        # most recent client traffic, only captured at DEBUG level; a
+        # fixed ring so even chatty connections stay at constant memory
+        self.rbuf = RingBuf(DEBUG_CAPTURE) if capture else None
+        # outbox of serial data not yet written to this client
+        self.sbuf = bytearray()
+        self.events = CLIENT_EVENTS
+        # relayed byte totals for the disconnect summary
+        self.rx_count = 0
+        self.tx_count = 0
+
+
+class SerialServer(object):
+    """Relays data between a local serial device and TCP clients.
+
+    Every byte read from the serial port is fanned out to all connected
+    clients, and every byte received from a client is written to the
+    serial port.
+    """
+
+    def __init__(self, config):
+        self._parse_template_obj(config)
+        self.tty = serial.Serial(
+            port=self.device,
+            baudrate=self.baud_rate,
+            bytesize=self.data_bits,
+            parity=self.parity,
+            stopbits=self.stop_bits,
+            timeout=0,
+        )
+        # fd -> ClientState for every accepted client socket, plus a flat
+        # list of the same records for the serial fan-out loop
+        self.clients = {}
+        self._client_list = []
+        # single receive buffer shared by all reads; data is relayed (or
+        # copied into a per-client accumulator) before the next read, so
+        # no allocation happens per I/O event
+        self._rxbuf = bytearray(self.receive_chunk)
+        self._rxmv = memoryview(self._rxbuf)
+        # captured once: accumulating full traffic per client is only
+        # worth the memory when someone is actually reading debug logs
+        self._debug = logger.isEnabledFor(logging.DEBUG)
+        self.listener = None
+        self._create_srv_socket()
+        self.poller = self._create_poller()
+        self.poller.register(self.listener.fileno(), select.EPOLLIN | select.EPOLLET)
+        self._tty_fd = self.tty.fileno()
+        # a slow serial device (80 bytes take ~83ms at 9600 baud) must
+        # never stall the reactor, so the fd itself is non-blocking and
+        # all serial I/O goes through it directly
+        flags = fcntl.fcntl(self._tty_fd, fcntl.F_GETFL)
+        fcntl.fcntl(self._tty_fd, fcntl.F_SETFL, flags | os.O_NONBLOCK)
+        self._tty_events = select.EPOLLIN | select.EPOLLET
+        self.poller.register(self._tty_fd, self._tty_events)
+        # chunks received from clients, written to the serial device in
+        # one gathering writev per poll cycle; bounded by OUTBOX_LIMIT
+        # like the per-client outboxes, tracked via a byte counter
+        self._tty_outbox = []
+        self._tty_pending = 0
+        # self-pipe so stop() can interrupt a fully blocking poll; the
+        # loop otherwise never wakes without work to do
+        self._wakeup_rfd, self._wakeup_wfd = os.pipe2(os.O_NONBLOCK)
+        self.poller.register(self._wakeup_rfd, select.EPOLLIN)
+        self._running = True
+        # set once handle() has returned; lets callers wait for the loop
+        # to wind down without going through thread join machinery
+        self.stopped = False
+        logger.info(
+            "Serial server %s initialized on %s:%s, relaying %s",
+            self.name,
+            self.host,
+            self.port,
+            self.device,
+        )
+
+    def _parse_template_obj(self, config):
+        self.name = _XP_NAME(config)[0]
+        self.host = _XP_HOST(config)[0]
+        self.port = int(_XP_PORT(config)[0])
+        self.device = _XP_DEVICE(config)[0]
+        self.baud_rate = int(_XP_BAUDRATE(config)[0])
+        self.data_bits = int(_XP_DATABITS(config)[0])
+        self.parity = _XP_PARITY(config)[0]
+        self.stop_bits = int(_XP_STOPBITS(config)[0])
+        receive_chunk = _XP_RECEIVE_CHUNK(config)
+        self.receive_chunk = int(receive_chunk[0]) if receive_chunk else RECV_CHUNK
+
+    @staticmethod
+    def _create_poller():
+        """Build the readiness backend for the event loop.
+
+        Edge-triggered epoll: each event is reported once and every
+        handler drains its fd completely before returning to poll. The
+        loop already batches work per wakeup (drain loops, gathered
+        writes), so an io_uring backend would plug in here if a
+        maintained binding ever enters the dependency set; the stdlib
+        offers nothing beyond epoll.
+        """
+        return _epoll()
+
+    def _create_srv_socket(self):
+        self.listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.listener.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        # lets additional relay processes share the port if one reactor
+        # ever becomes the accept bottleneck
+        self.listener.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+        # set before listen() so accepted sockets inherit the value
+        self.listener.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, SOCK_BUF_SIZE)
+        self.listener.bind((self.host, self.port))
+        self.listener.listen(4096)
+        self.listener.setblocking(False)
+        # rebind in case port 0 was requested
+        self.port = self.listener.getsockname()[1]
+
+    def _add_client(self, sock, address):
+        sock.setblocking(False)
+        # the relay emits small serial-sized bursts; without TCP_NODELAY
+        # Nagle would sit on them for up to ~40ms
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, SOCK_BUF_SIZE)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, SOCK_BUF_SIZE)
+        cs = ClientState(sock, address, capture=self._debug)
+        self.clients[cs.fd] = cs
+        cs.index = len(self._client_list)
+        self._client_list.append(cs)
+        self.poller.register(cs.fd, CLIENT_EVENTS)
+        logger.info(
+            "New connection from %s:%s on serial server %s",
+            address[0],
+            address[1],
+            self.name,
+        )
+
+    def _remove_client(self, fd):
+        cs = self.clients.pop(fd)
+        last = self._client_list.pop()
+        if last is not cs:
+            self._client_list[cs.index] = last
+            last.index = cs.index
+        self.poller.unregister(fd)
+        logger.info(
+            "Client %s:%s disconnected from serial server %s "
+            "(%d bytes in, %d bytes out)",
+            cs.address[0],
+            cs.address[1],
+            self.name,
+            cs.rx_count,
+            cs.tx_count,
+        )
+        cs.sock.close()
+
+    def _enable_write(self, cs):
+        if not cs.events & select.EPOLLOUT:
+            cs.events |= select.EPOLLOUT
+            self.poller.modify(cs.fd, cs.events)
+
+    def _send_to_client(self, cs, data):
+        """Send directly while the outbox is empty, buffering whatever
+        the socket will not take right now."""
+        if not cs.sbuf:
+            try:
+                sent = cs.sock.send(data)
+            except BlockingIOError:
+                sent = 0
+            except OSError:
+                # connection already dead; epoll reports it for cleanup
+                return
+            else:
+                cs.tx_count += sent
+            if sent == len(data):
+                return
+            data = data[sent:]
+        if len(cs.sbuf) + len(data) > OUTBOX_LIMIT:
+            # slow consumer: keep memory bounded by dropping the data
+            # rather than queueing without limit
+            logger.debug("Dropping %d bytes for %s: outbox full", len(data), cs.address)
+            return
+        self._build_response(cs, data)
+        self._enable_write(cs)
+
+    def _flush_client(self, cs):
+        """Write as much of the client's outbox as the socket accepts,
+        dropping the EPOLLOUT interest once it is empty."""
+        try:
+            sent = cs.sock.send(cs.sbuf)
+        except BlockingIOError:
+            return
+        except OSError:
+            self._remove_client(cs.fd)
+            return
+        cs.tx_count += sent
+        del cs.sbuf[:sent]
+        if not cs.sbuf:
+            cs.events &= ~select.EPOLLOUT
+            self.poller.modify(cs.fd, cs.events)
+
+    def _build_request(self, cs, raw_data):
+        cs.rx_count += len(raw_data)
+        if self._debug:
+            cs.rbuf.write(raw_data)
+            logger.debug(
+                "Received %d bytes from %s for %s",
+                len(raw_data),
+                cs.address,
+                self.device,
+            )
+
+    def _build_response(self, cs, raw_data):
+        cs.sbuf.extend(raw_data)
+        if self._debug:
+            logger.debug(
+                "Queued %d bytes from %s for %s",
+                len(raw_data),
+                self.device,
+                cs.address,
+            )
+
+    def _on_listener_readable(self):
+        while True:
+            try:
+                sock, address = self.listener.accept()
+            except BlockingIOError:
+                break
+            self._add_client(sock, address)
+
+    def _on_tty_readable(self):
+        while True:
+            try:
+                n = os.readv(self._tty_fd, [self._rxmv])
+            except BlockingIOError:
+                break
+            if not n:
+                break
+            data = self._rxmv[:n]
+            for cs in self._client_list:
+                self._send_to_client(cs, data)
+
+    def _flush_tty(self):
+        """Drain the pending client chunks to the serial device with a
+        single gathering write, keeping any remainder for the next cycle."""
+        outbox = self._tty_outbox
+        if outbox:
+            # the kernel caps gathering writes at IOV_MAX iovecs; a deep
+            # backlog gets flushed over several cycles instead
+            iov = outbox if len(outbox) <= IOV_MAX else outbox[:IOV_MAX]
+            try:
+                written = os.writev(self._tty_fd, iov)
+            except BlockingIOError:
+                written = 0
+            except OSError:
+                # the device went away or rejected the write; dropping
+                # the backlog beats crashing the relay
+                logger.exception(
+                    "Serial write to %s failed, dropping %d pending chunks",
+                    self.device,
+                    len(outbox),
+                )
+                del outbox[:]
+                self._tty_pending = 0
+                written = 0
+            self._tty_pending -= written
+            while written:
+                chunk = outbox[0]
+                if written >= len(chunk):
+                    written -= len(chunk)
+                    del outbox[0]
+                else:
+                    outbox[0] = chunk[written:]
+                    written = 0
+        # watch for writability only while something is left to write
+        events = select.EPOLLIN | select.EPOLLET
+        if outbox:
+            events |= select.EPOLLOUT
+        if events != self._tty_events:
+            self._tty_events = events
+            self.poller.modify(self._tty_fd, events)
+
+    def _on_client_event(self, fd, event):
+        cs = self.clients.get(fd)
+        if cs is None:
+            return
+        # drain before acting on hangup flags: a client that sends and
+        # closes in one go delivers EPOLLIN|EPOLLRDHUP together, and its
+        # payload must be read out before the socket is dropped (recv
+        # returning 0 handles the close itself)
+        if event & select.EPOLLIN:
+            while fd in self.clients:
+                try:
+                    n = cs.sock.recv_into(self._rxmv)
+                except BlockingIOError:
+                    break
+                except OSError:
+                    self._remove_client(fd)
+                    break
+                if not n:
+                    self._remove_client(fd)
+                    break
+                data = self._rxmv[:n]
+                self._build_request(cs, data)
+                if self._tty_pending + n > OUTBOX_LIMIT:
+                    # a client pumping TCP-rate data at a slow serial
+                    # device: keep memory bounded by dropping the excess
+                    logger.debug(
+                        "Dropping %d bytes for %s: serial outbox full",
+                        n,
+                        self.device,
+                    )
+                    continue
+                # copy out of the shared receive buffer; the outbox is
+                # drained after all events in the cycle are processed
+                self._tty_outbox.append(bytes(data))
+                self._tty_pending += n
+        if event & select.EPOLLOUT and fd in self.clients:
+            self._flush_client(cs)
+        if (
+            event & (select.EPOLLHUP | select.EPOLLERR | select.EPOLLRDHUP)
+            and fd in self.clients
+        ):
+            self._remove_client(fd)
+
+    def handle(self):
+        """Dispatch readiness events until stop() is called.
+
+        Every handler is non-blocking: client writes go through per-client
+        outboxes, so a slow or stalled client only ever delays itself and
+        never the other clients or the serial device.
+        """
+        # bind everything the loop touches to locals; LOAD_FAST beats a
+        # LOAD_ATTR dict probe on a path that runs per I/O event
+        listener_fd = self.listener.fileno()
+        tty_fd = self._tty_fd
+        poll = self.poller.poll
+        on_listener_readable = self._on_listener_readable
+        on_tty_readable = self._on_tty_readable
+        on_client_event = self._on_client_event
+        flush_tty = self._flush_tty
+        wakeup_fd = self._wakeup_rfd
+        epollin = select.EPOLLIN
+        try:
+            while self._running:
+                # block until there is actual work; stop() pokes the
+                # self-pipe, so no periodic timeout wakeups are needed
+                for fd, event in poll(-1):
+                    if fd == wakeup_fd:
+                        os.read(wakeup_fd, 1)
+                    elif fd == listener_fd:
+                        on_listener_readable()
+                    elif fd == tty_fd:
+                        if event & epollin:
+                            on_tty_readable()
+                    else:
+                        on_client_event(fd, event)
+                flush_tty()
+        finally:
+            self.stopped = True
+
+    def stop(self):
+        self._running = False
+        try:
+            os.write(self._wakeup_wfd, b"\x00")
+        except OSError:
+            pass
+
+    def shutdown(self):
+        self.stop()
+        for fd in list(self.clients):
+            self._remove_client(fd)
+        self.poller.close()
+        self.listener.close()
+        self.tty.close()
+        os.close(self._wakeup_rfd)
+        os.close(self._wakeup_wfd)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    dom = etree.parse(sys.argv[1])
+    servers = []
+    for server_config in dom.xpath("//serials/serial"):
+        server = SerialServer(server_config)
+        servers.append(server)
+        threading.Thread(target=server.handle, daemon=True).start()
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        for server in servers:
+            server.shutdown()
@@ -0,0 +1,159 @@
+# Copyright (C) 2026  the Conpot developers
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
+
+import os
+import pty
+import socket
+import time
+import unittest
+
+from gevent import monkey
+from lxml import etree
+
+from conpot.protocols.serial.serial_server import RingBuf, SerialServer
+
+# the relay runs a blocking epoll loop, so it needs a real OS thread
+# even when the rest of the suite has monkey-patched threading; raw
+# _thread avoids the patched lock machinery in threading.Thread
+start_thread = monkey.get_original("_thread", "start_new_thread")
+
+SERIAL_TEMPLATE = """
+<serials enabled="True">
+    <serial name="test_serial" host="127.0.0.1" port="0">
+        <device>{device}</device>
+        <baudrate>9600</baudrate>
+        <databits>8</databits>
+        <parity>N</parity>
+        <stopbits>1</stopbits>
+    </serial>
+</serials>
+"""
+
+
+class TestSerialServer(unittest.TestCase):
+    def setUp(self):
+        # a pty pair stands in for the physical serial device
+        self.master_fd, slave_fd = pty.openpty()
+        dom = etree.fromstring(SERIAL_TEMPLATE.format(device=os.ttyname(slave_fd)))
+        self.server = SerialServer(dom.xpath("//serial")[0])
+        start_thread(self.server.handle, ())
+
+    def tearDown(self):
+        self.server.stop()
+        for _ in range(100):
+            if self.server.stopped:
+                break
+            time.sleep(0.05)
+        self.server.shutdown()
+        os.close(self.master_fd)
+
+    def _connect_client(self):
+        s = socket.create_connection(("127.0.0.1", self.server.port), timeout=5)
+        s.settimeout(5)
+        # wait until the server has accepted the connection, otherwise
+        # data written to the pty may be relayed before the client exists
+        for _ in range(100):
+            if self.server.clients:
+                break
+            time.sleep(0.05)
+        return s
+
+    def _read_master(self, count):
+        data = b""
+        deadline = time.time() + 5
+        while len(data) < count and time.time() < deadline:
+            data += os.read(self.master_fd, count - len(data))
+        return data
+
+    def test_client_to_serial(self):
+        test_input = b"request from attacker"
+        s = self._connect_client()
+        s.sendall(test_input)
+        received = self._read_master(len(test_input))
+        s.close()
+        self.assertEqual(test_input, received)
+
+    def test_client_send_then_close(self):
+        # one-shot probes (echo cmd | nc host port) deliver their payload
+        # and the hangup in the same event; the payload must still relay
+        test_input = b"one-shot probe"
+        s = self._connect_client()
+        s.sendall(test_input)
+        s.close()
+        received = self._read_master(len(test_input))
+        self.assertEqual(test_input, received)
+
+    def test_serial_to_client(self):
+        test_input = b"response from device"
+        s = self._connect_client()
+        os.write(self.master_fd, test_input)
+        received = s.recv(len(test_input))
+        s.close()
+        self.assertEqual(test_input, received)
+
+    def test_serial_fan_out(self):
+        test_input = b"broadcast from device"
+        s1 = self._connect_client()
+        s2 = socket.create_connection(("127.0.0.1", self.server.port), timeout=5)
+        s2.settimeout(5)
+        for _ in range(100):
+            if len(self.server.clients) == 2:
+                break
+            time.sleep(0.05)
+        os.write(self.master_fd, test_input)
+        received_1 = s1.recv(len(test_input))
+        received_2 = s2.recv(len(test_input))
+        s1.close()
+        s2.close()
+        self.assertEqual(test_input, received_1)
+        self.assertEqual(test_input, received_2)
+
+
+class TestRingBuf(unittest.TestCase):
+    def test_partial_fill(self):
+        ring = RingBuf(8)
+        ring.write(b"abc")
+        self.assertEqual(3, len(ring))
+        self.assertEqual(b"abc", ring.getvalue())
+
+    def test_wrap_around(self):
+        ring = RingBuf(8)
+        ring.write(b"abcdef")
+        ring.write(b"ghij")
+        self.assertEqual(8, len(ring))
+        self.assertEqual(b"cdefghij", ring.getvalue())
+
+    def test_oversized_write(self):
+        ring = RingBuf(4)
+        ring.write(b"abcdefgh")
+        self.assertEqual(b"efgh", ring.getvalue())
+
+    def test_graduated_growth(self):
+        ring = RingBuf(1 << 16)
+        self.assertEqual(1 << 12, ring.cap)
+        chunk = b"x" * 4096
+        for _ in range(16):
+            ring.write(chunk)
+        self.assertEqual(1 << 14, ring.cap)
+        for _ in range(256):
+            ring.write(chunk)
+        self.assertEqual(1 << 16, ring.cap)
+        self.assertEqual(chunk * 16, ring.getvalue())
+
+
+if __name__ == "__main__":
+    unittest.main()